@@ -9,6 +9,45 @@ from typing import Dict, List
 import matplotlib.pyplot as plt
 
 from backtest.engine import BacktestResult, SignalState
+from tsmom._compat import NUMBA_AVAILABLE, njit
+
+
+def _distribution_numpy(state, closed, pnl, pnl_pct):
+    """Conteggi e somme per direzione tramite maschere booleane"""
+    long_mask = closed & (state == SignalState.LONG.value)
+    short_mask = closed & (state == SignalState.SHORT.value)
+    return (
+        np.count_nonzero(long_mask), np.count_nonzero(long_mask & (pnl > 0)), pnl_pct[long_mask].sum(),
+        np.count_nonzero(short_mask), np.count_nonzero(short_mask & (pnl > 0)), pnl_pct[short_mask].sum(),
+    )
+
+
+if NUMBA_AVAILABLE:
+    # Seriale: con ~centinaia di operazioni una riduzione parallela non
+    # guadagna nulla, e il pool di thread di Numba renderebbe insicuri i
+    # fork successivi (ProcessPoolExecutor)
+    @njit(cache=True)
+    def _distribution_kernel(state, closed, pnl, pnl_pct):
+        """Conteggi e somme per direzione in un unico passaggio"""
+        long_n = 0
+        long_wins = 0
+        long_pct = 0.0
+        short_n = 0
+        short_wins = 0
+        short_pct = 0.0
+        for i in range(state.shape[0]):
+            if closed[i]:
+                if state[i] == 1:
+                    long_n += 1
+                    long_wins += pnl[i] > 0
+                    long_pct += pnl_pct[i]
+                elif state[i] == -1:
+                    short_n += 1
+                    short_wins += pnl[i] > 0
+                    short_pct += pnl_pct[i]
+        return long_n, long_wins, long_pct, short_n, short_wins, short_pct
+else:
+    _distribution_kernel = _distribution_numpy
 
 
 class PerformanceAnalyzer:
@@ -22,9 +61,11 @@ class PerformanceAnalyzer:
         Returns:
             Dictionary con le statistiche principali
         """
-        closed_trades = [t for t in result.trades if t.is_closed()]
+        log = result.log
+        closed = log.closed
+        pnl = log.pnl[closed]
         
-        if not closed_trades:
+        if not pnl.size:
             return {
                 'total_trades': 0,
                 'winning_trades': 0,
@@ -38,23 +79,24 @@ class PerformanceAnalyzer:
                 'avg_bars_held': 0
             }
         
-        pnls = [t.pnl for t in closed_trades]
-        pnls_pct = [t.pnl_pct for t in closed_trades]
-        bars_held = [t.bars_held for t in closed_trades if t.bars_held]
+        pnl_pct = log.pnl_pct[closed]
+        bars_held = log.bars_held[closed]
+        bars_held = bars_held[bars_held != 0]
+        wins = np.count_nonzero(pnl > 0)
         
         return {
-            'total_trades': result.total_trades,
-            'winning_trades': result.winning_trades,
-            'losing_trades': result.losing_trades,
-            'win_rate': result.win_rate,
-            'total_pnl': result.total_pnl,
-            'avg_pnl': np.mean(pnls),
-            'avg_pnl_pct': result.avg_pnl_pct,
-            'largest_win': max(pnls),
-            'largest_loss': min(pnls),
-            'avg_bars_held': np.mean(bars_held) if bars_held else 0,
-            'max_bars_held': max(bars_held) if bars_held else 0,
-            'min_bars_held': min(bars_held) if bars_held else 0,
+            'total_trades': pnl.size,
+            'winning_trades': wins,
+            'losing_trades': np.count_nonzero(pnl < 0),
+            'win_rate': wins / pnl.size,
+            'total_pnl': pnl.sum(),
+            'avg_pnl': pnl.mean(),
+            'avg_pnl_pct': pnl_pct.mean(),
+            'largest_win': pnl.max(),
+            'largest_loss': pnl.min(),
+            'avg_bars_held': bars_held.mean() if bars_held.size else 0,
+            'max_bars_held': bars_held.max() if bars_held.size else 0,
+            'min_bars_held': bars_held.min() if bars_held.size else 0,
         }
     
     @staticmethod
@@ -65,18 +107,18 @@ class PerformanceAnalyzer:
         Returns:
             Dictionary con statistiche sulla distribuzione
         """
-        closed_trades = [t for t in result.trades if t.is_closed()]
-        
-        long_trades = [t for t in closed_trades if t.entry_state == SignalState.LONG]
-        short_trades = [t for t in closed_trades if t.entry_state == SignalState.SHORT]
+        log = result.log
+        long_n, long_wins, long_pct, short_n, short_wins, short_pct = _distribution_kernel(
+            log.entry_state_code, log.closed, log.pnl, log.pnl_pct
+        )
         
         return {
-            'long_trades': len(long_trades),
-            'short_trades': len(short_trades),
-            'long_win_rate': len([t for t in long_trades if t.pnl > 0]) / len(long_trades) if long_trades else 0,
-            'short_win_rate': len([t for t in short_trades if t.pnl > 0]) / len(short_trades) if short_trades else 0,
-            'long_avg_pnl_pct': np.mean([t.pnl_pct for t in long_trades]) if long_trades else 0,
-            'short_avg_pnl_pct': np.mean([t.pnl_pct for t in short_trades]) if short_trades else 0,
+            'long_trades': long_n,
+            'short_trades': short_n,
+            'long_win_rate': long_wins / long_n if long_n else 0,
+            'short_win_rate': short_wins / short_n if short_n else 0,
+            'long_avg_pnl_pct': long_pct / long_n if long_n else 0,
+            'short_avg_pnl_pct': short_pct / short_n if short_n else 0,
         }
     
     @staticmethod
@@ -87,8 +129,8 @@ class PerformanceAnalyzer:
         Returns:
             Series con i P&L percentuali di tutte le operazioni chiuse
         """
-        closed_trades = [t for t in result.trades if t.is_closed()]
-        return pd.Series([t.pnl_pct * 100 for t in closed_trades])
+        log = result.log
+        return pd.Series(log.pnl_pct[log.closed] * 100)
     
     @staticmethod
     def print_report(result: BacktestResult):
@@ -182,11 +224,13 @@ class Plotter:
         
         ax.plot(signals_df.index, signals_df['close'], label='Price', linewidth=1.5, color='black')
         
-        # Plotta le operazioni
-        for trade in result.trades:
-            if trade.is_closed():
-                ax.plot(trade.entry_time, trade.entry_price, 'g^', markersize=8)
-                ax.plot(trade.exit_time, trade.exit_price, 'rv', markersize=8)
+        # Plotta le operazioni: due sole chiamate per tutte le entrate/uscite
+        log = result.log
+        closed = log.closed
+        ax.scatter(log.timestamps('entry_time')[closed], log.entry_price[closed],
+                   marker='^', color='g', s=64)
+        ax.scatter(log.timestamps('exit_time')[closed], log.exit_price[closed],
+                   marker='v', color='r', s=64)
         
         ax.set_title('TSMOM - Price and Trades', fontsize=14, fontweight='bold')
         ax.set_xlabel('Date')
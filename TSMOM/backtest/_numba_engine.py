@@ -0,0 +1,65 @@
+"""
+Backtest Core
+Kernel compilati per la macchina a stati del backtest
+"""
+
+import numpy as np
+
+from tsmom._compat import NUMBA_AVAILABLE, njit
+
+
+def _run_core_numpy(states: np.ndarray):
+    """
+    Individua le operazioni a partire dagli stati codificati (int8)
+    
+    Ogni tratto consecutivo non FLAT è un'operazione: entra alla barra del
+    cambio di stato ed esce al cambio successivo (o all'ultima barra).
+    
+    Returns:
+        Tupla (entry_i, exit_i, direction) di array paralleli
+    """
+    n = len(states)
+    # Lo stato iniziale è FLAT: una prima barra LONG/SHORT è già un cambio
+    boundaries = np.flatnonzero(np.r_[states[:1] != 0, states[1:] != states[:-1]])
+    if not boundaries.size:
+        return boundaries, boundaries.copy(), states[:0].copy()
+    
+    exits = np.append(boundaries[1:], n - 1)
+    direction = states[boundaries]
+    keep = direction != 0
+    return boundaries[keep], exits[keep], direction[keep]
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _run_core(states):
+        """Versione compilata di _run_core_numpy: un solo passaggio sulle barre"""
+        n = states.shape[0]
+        entry_i = np.empty(n, dtype=np.int64)
+        exit_i = np.empty(n, dtype=np.int64)
+        direction = np.empty(n, dtype=np.int8)
+        
+        k = 0
+        current = 0
+        start = 0
+        for i in range(n):
+            state = states[i]
+            if state != current:
+                if current != 0:
+                    entry_i[k] = start
+                    exit_i[k] = i
+                    direction[k] = current
+                    k += 1
+                current = state
+                start = i
+        
+        # Chiude la posizione ancora aperta sull'ultima barra
+        if current != 0:
+            entry_i[k] = start
+            exit_i[k] = n - 1
+            direction[k] = current
+            k += 1
+        
+        return entry_i[:k], exit_i[:k], direction[:k]
+else:
+    _run_core = _run_core_numpy
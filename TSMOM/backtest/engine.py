@@ -6,10 +6,13 @@ Motore di simulazione per la strategia TSMOM
 import pandas as pd
 import numpy as np
 from dataclasses import dataclass, field
-from typing import List
+from functools import cached_property
+from typing import List, Union
 from enum import Enum
 
-from tsmom.strategy import TSMOM, SignalState
+from tsmom.strategy import TSMOM, SignalState, SignalColumns
+from tsmom._compat import DATACLASS_SLOTS
+from backtest._numba_engine import _run_core
 
 
 class PositionState(Enum):
@@ -19,7 +22,7 @@ class PositionState(Enum):
     SHORT = -1
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Trade:
     """Rappresenta un'operazione di trading"""
     entry_time: pd.Timestamp
@@ -37,12 +40,9 @@ class Trade:
         self.exit_price = exit_price
         self.bars_held = self._calculate_bars()
         
-        if self.entry_state == SignalState.LONG:
-            self.pnl = exit_price - self.entry_price
-            self.pnl_pct = (exit_price - self.entry_price) / self.entry_price
-        else:  # SHORT
-            self.pnl = self.entry_price - exit_price
-            self.pnl_pct = (self.entry_price - exit_price) / self.entry_price
+        # Direzione con segno (LONG = 1, SHORT = -1): nessun ramo per lato
+        self.pnl = self.entry_state.value * (exit_price - self.entry_price)
+        self.pnl_pct = self.pnl / self.entry_price
     
     def _calculate_bars(self) -> int:
         """Calcola il numero di bar della posizione"""
@@ -57,45 +57,208 @@ class Trade:
         return self.exit_price is not None
 
 
+NS_PER_DAY = 86_400 * 10**9
+
+
+def _index_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """Timestamp dell'indice come int64 in nanosecondi (UTC), qualunque sia la risoluzione"""
+    return np.asarray(index.values, dtype='datetime64[ns]').view(np.int64)
+
+
+class TradeLog:
+    """
+    Registro colonnare (SoA) delle operazioni
+    
+    Ogni campo è un np.ndarray parallelo (un elemento per operazione), così
+    le statistiche si calcolano come riduzioni vettoriali invece che
+    iterando su oggetti Trade. I tempi sono in nanosecondi (int64) e lo
+    stato di entrata è codificato come int8 (LONG=1, SHORT=-1).
+    """
+    
+    __slots__ = ('_size', '_columns', 'tz')
+    
+    FIELDS = {
+        'entry_time': np.int64,
+        'exit_time': np.int64,
+        'entry_price': np.float64,
+        'exit_price': np.float64,
+        'pnl': np.float64,
+        'pnl_pct': np.float64,
+        'bars_held': np.int64,
+        'entry_state_code': np.int8,
+        'closed': np.bool_,
+    }
+    
+    def __init__(self, capacity: int = 64):
+        """
+        Inizializza il registro
+        
+        Args:
+            capacity: Capacità iniziale (raddoppiata quando il registro è pieno)
+        """
+        self._size = 0
+        self._columns = {
+            name: np.zeros(max(capacity, 1), dtype=dtype)
+            for name, dtype in self.FIELDS.items()
+        }
+        self.tz = None
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Restituisce la vista della colonna sulle sole operazioni registrate"""
+        if name in TradeLog.FIELDS:
+            return self._columns[name][:self._size]
+        raise AttributeError(name)
+    
+    def _grow(self):
+        """Raddoppia la capacità delle colonne"""
+        for name, column in self._columns.items():
+            grown = np.zeros(2 * len(column), dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+    
+    def extend(
+        self,
+        entry_time: np.ndarray,
+        entry_price: np.ndarray,
+        entry_state_code: np.ndarray,
+        exit_time: np.ndarray,
+        exit_price: np.ndarray,
+        tz=None
+    ):
+        """
+        Registra in blocco operazioni chiuse da array paralleli
+        
+        Args:
+            entry_time: Timestamp di entrata (int64, nanosecondi)
+            entry_price: Prezzi di entrata
+            entry_state_code: Direzioni codificate (1 = LONG, -1 = SHORT)
+            exit_time: Timestamp di uscita (int64, nanosecondi)
+            exit_price: Prezzi di uscita
+            tz: Fuso orario dei timestamp
+        """
+        m = len(entry_time)
+        while self._size + m > len(self._columns['closed']):
+            self._grow()
+        
+        lo, hi = self._size, self._size + m
+        cols = self._columns
+        self.tz = tz
+        
+        cols['entry_time'][lo:hi] = entry_time
+        cols['entry_price'][lo:hi] = entry_price
+        cols['entry_state_code'][lo:hi] = entry_state_code
+        cols['exit_time'][lo:hi] = exit_time
+        cols['exit_price'][lo:hi] = exit_price
+        cols['closed'][lo:hi] = True
+        self._settle(lo, hi)
+        
+        self._size = hi
+    
+    def _settle(self, lo: int, hi: int):
+        """
+        Calcola P&L, P&L % e durata delle operazioni chiuse [lo, hi)
+        
+        Un'unica passata vettoriale e senza rami sul lato:
+        pnl = direzione * (uscita - entrata), pnl_pct = pnl / entrata
+        """
+        cols = self._columns
+        entry_price = cols['entry_price'][lo:hi]
+        pnl = cols['pnl'][lo:hi]
+        
+        np.subtract(cols['exit_price'][lo:hi], entry_price, out=pnl)
+        pnl *= cols['entry_state_code'][lo:hi]
+        np.divide(pnl, entry_price, out=cols['pnl_pct'][lo:hi])
+        np.floor_divide(
+            cols['exit_time'][lo:hi] - cols['entry_time'][lo:hi],
+            NS_PER_DAY,
+            out=cols['bars_held'][lo:hi]
+        )
+    
+    def timestamps(self, name: str) -> pd.DatetimeIndex:
+        """Colonna di tempi ('entry_time' o 'exit_time') come DatetimeIndex"""
+        return pd.to_datetime(getattr(self, name), utc=True).tz_convert(self.tz)
+    
+    def trade(self, i: int) -> Trade:
+        """Costruisce la vista Trade dell'i-esima operazione"""
+        closed = bool(self.closed[i])
+        return Trade(
+            entry_time=pd.Timestamp(int(self.entry_time[i]), tz=self.tz),
+            entry_price=float(self.entry_price[i]),
+            entry_state=SignalState(int(self.entry_state_code[i])),
+            exit_time=pd.Timestamp(int(self.exit_time[i]), tz=self.tz) if closed else None,
+            exit_price=float(self.exit_price[i]) if closed else None,
+            pnl=float(self.pnl[i]) if closed else None,
+            pnl_pct=float(self.pnl_pct[i]) if closed else None,
+            bars_held=int(self.bars_held[i]) if closed else None
+        )
+    
+    def to_trades(self) -> List[Trade]:
+        """Converte il registro in una lista di oggetti Trade"""
+        return [self.trade(i) for i in range(self._size)]
+
+
 @dataclass
 class BacktestResult:
-    """Risultati del backtest"""
-    trades: List[Trade] = field(default_factory=list)
+    """
+    Risultati del backtest
+    
+    Il risultato è immutabile dopo run(): le statistiche derivate sono
+    calcolate una sola volta e memorizzate sull'istanza.
+    """
+    log: TradeLog = field(default_factory=TradeLog)
     equity_curve: pd.Series = None
     
-    @property
+    @cached_property
+    def trades(self) -> List[Trade]:
+        """Operazioni come oggetti Trade (vista di compatibilità sul registro)"""
+        return self.log.to_trades()
+    
+    @cached_property
+    def _closed_pnl(self) -> np.ndarray:
+        """P&L delle sole operazioni chiuse"""
+        return self.log.pnl[self.log.closed]
+    
+    @cached_property
     def total_trades(self) -> int:
         """Numero totale di operazioni chiuse"""
-        return len([t for t in self.trades if t.is_closed()])
+        return self._closed_pnl.size
+    
+    @cached_property
+    def open_trades(self) -> int:
+        """Numero di operazioni ancora aperte"""
+        return len(self.log) - self.total_trades
     
-    @property
+    @cached_property
     def winning_trades(self) -> int:
         """Numero di operazioni in profitto"""
-        return len([t for t in self.trades if t.is_closed() and t.pnl > 0])
+        return np.count_nonzero(self._closed_pnl > 0)
     
-    @property
+    @cached_property
     def losing_trades(self) -> int:
         """Numero di operazioni in perdita"""
-        return len([t for t in self.trades if t.is_closed() and t.pnl < 0])
+        return np.count_nonzero(self._closed_pnl < 0)
     
-    @property
+    @cached_property
     def win_rate(self) -> float:
         """Percentuale di operazioni in profitto"""
         total = self.total_trades
         return self.winning_trades / total if total > 0 else 0
     
-    @property
+    @cached_property
     def total_pnl(self) -> float:
         """P&L totale"""
-        return sum(t.pnl for t in self.trades if t.is_closed())
+        return self._closed_pnl.sum()
     
-    @property
+    @cached_property
     def avg_pnl_pct(self) -> float:
         """P&L medio in percentuale"""
-        closed_trades = [t for t in self.trades if t.is_closed()]
-        if not closed_trades:
+        closed_pct = self.log.pnl_pct[self.log.closed]
+        if not closed_pct.size:
             return 0
-        return np.mean([t.pnl_pct for t in closed_trades])
+        return closed_pct.mean()
 
 
 class BacktestEngine:
@@ -119,102 +282,99 @@ class BacktestEngine:
         self.strategy = strategy
         self.initial_capital = initial_capital
         
-    def run(self, data: pd.DataFrame) -> BacktestResult:
+    def run(
+        self,
+        data: pd.DataFrame,
+        signals_df: Union[pd.DataFrame, SignalColumns] = None
+    ) -> BacktestResult:
         """
         Esegue il backtest sulla serie storica
         
         Args:
             data: DataFrame con colonna 'close' (OHLC)
+            signals_df: Segnali già calcolati con strategy.generate_signals(data)
+                        o strategy.generate_signals_soa(data); se None
+                        vengono generati qui
             
         Returns:
             BacktestResult con i risultati del backtest
         """
-        # Genera i segnali
-        signals_df = self.strategy.generate_signals(data)
+        # Genera i segnali solo se non forniti dal chiamante; il backtest
+        # lavora sugli array colonnari, senza passare dal DataFrame
+        if signals_df is None:
+            signals = self.strategy.generate_signals_soa(data)
+        elif isinstance(signals_df, SignalColumns):
+            signals = signals_df
+        else:
+            signals = SignalColumns.from_frame(signals_df)
         
-        result = BacktestResult()
-        current_position = None
-        current_state = SignalState.FLAT
+        # Stati, prezzi e timestamp come array contigui
+        states = np.ascontiguousarray(signals.signal, dtype=np.int8)
+        prices = signals.close
+        times = _index_ns(signals.index)
         
-        # Itera su ogni riga del dataframe
-        for idx, row in signals_df.iterrows():
-            new_state = row['signal_state']
-            current_price = row['close']
-            
-            # Cambio di segnale: chiudi posizione e aprine una nuova
-            if new_state != current_state:
-                
-                # Chiudi posizione precedente se esiste
-                if current_position is not None:
-                    current_position.close(idx, current_price)
-                    result.trades.append(current_position)
-                
-                # Apri nuova posizione se non è FLAT
-                if new_state != SignalState.FLAT:
-                    current_position = Trade(
-                        entry_time=idx,
-                        entry_price=current_price,
-                        entry_state=new_state
-                    )
-                else:
-                    current_position = None
-                
-                current_state = new_state
-        
-        # Chiudi posizione finale se ancora aperta
-        if current_position is not None:
-            current_position.close(signals_df.index[-1], signals_df.iloc[-1]['close'])
-            result.trades.append(current_position)
+        # La macchina a stati restituisce gli indici di entrata/uscita di
+        # ogni operazione; prezzi e P&L si ricavano in blocco
+        entry_i, exit_i, direction = _run_core(states)
+        log = TradeLog(capacity=len(entry_i))
+        log.extend(
+            entry_time=times[entry_i],
+            entry_price=prices[entry_i],
+            entry_state_code=direction,
+            exit_time=times[exit_i],
+            exit_price=prices[exit_i],
+            tz=getattr(signals.index, 'tz', None)
+        )
         
         # Calcola l'equity curve
-        result.equity_curve = self._calculate_equity_curve(
-            signals_df, result.trades
-        )
+        result = BacktestResult(log=log)
+        result.equity_curve = self._calculate_equity_curve(signals, log)
         
         return result
     
     def _calculate_equity_curve(
         self,
-        signals_df: pd.DataFrame,
-        trades: List[Trade]
+        signals: SignalColumns,
+        log: TradeLog
     ) -> pd.Series:
-        """Calcola la curva di equity in modo semplificato"""
-        equity = pd.Series(
-            self.initial_capital, 
-            index=signals_df.index, 
-            dtype=float
-        )
+        """
+        Calcola la curva di equity in modo vettoriale
         
-        # Itera su ogni timestamp e calcola il P&L cumulative
-        cumulative_pnl = 0
+        equity = capitale iniziale + P&L realizzato cumulato
+                 + P&L non realizzato del trade aperto
+        """
+        times = _index_ns(signals.index)
+        prices = signals.close
+        n = len(prices)
         
-        for i, (idx, row) in enumerate(signals_df.iterrows()):
-            current_price = row['close']
-            
-            # Cerca il trade attivo a questo timestamp
-            active_trade = None
-            for trade in trades:
-                if (trade.entry_time <= idx and 
-                    (trade.exit_time is None or trade.exit_time >= idx)):
-                    active_trade = trade
-                    break
-            
-            # Se c'è un trade attivo, calcola l'unrealized P&L
-            if active_trade:
-                entry_price = active_trade.entry_price
-                
-                if active_trade.entry_state == SignalState.LONG:
-                    unrealized_pnl = current_price - entry_price
-                else:  # SHORT
-                    unrealized_pnl = entry_price - current_price
-                
-                equity.iloc[i] = self.initial_capital + cumulative_pnl + unrealized_pnl
-            else:
-                # Nessun trade attivo
-                equity.iloc[i] = self.initial_capital + cumulative_pnl
-            
-            # Se il trade è stato chiuso, aggiorna il P&L cumulativo
-            if active_trade and active_trade.exit_time == idx:
-                cumulative_pnl += active_trade.pnl
+        realized = np.zeros(n)
+        
+        # Risolve gli intervalli di tutti i trade con due ricerche binarie
+        # vettoriali: il trade è aperto sulle barre [lo, hi), mentre alla
+        # barra di uscita il suo P&L è già contabilizzato come realizzato
+        closed = log.closed
+        lo = np.searchsorted(times, log.entry_time[closed])
+        hi = np.searchsorted(times, log.exit_time[closed])
+        
+        # Indice del trade aperto su ogni barra (-1 = nessuno): i trade sono
+        # ordinati per entrata, quindi su trade contigui vale il più recente
+        active = np.full(n, -1, dtype=np.int32)
+        for k, (start, stop) in enumerate(zip(lo, hi)):
+            active[start:stop] = k
+        
+        in_range = hi < n
+        np.add.at(realized, hi[in_range], log.pnl[closed][in_range])
+        
+        # Accumula tutto in un unico buffer con operazioni in place,
+        # senza array temporanei per ogni termine della somma
+        is_open = active >= 0
+        k = active[is_open]
+        equity = np.zeros(n)
+        equity[is_open] = (
+            (prices[is_open] - log.entry_price[closed][k])
+            * log.entry_state_code[closed][k]
+        )
+        equity += np.cumsum(realized, out=realized)
+        equity += self.initial_capital
         
-        return equity
+        return pd.Series(equity, index=signals.index, dtype=np.float64, copy=False)
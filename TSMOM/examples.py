@@ -2,12 +2,36 @@
 Example: Utilizzo programmtico della libreria TSMOM
 """
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
 import pandas as pd
 from tsmom.strategy import TSMOM, SignalState
 from backtest.engine import BacktestEngine
 from analysis.stats import PerformanceAnalyzer, Plotter
 
 
+def _sample_data(periods: int, seed: int, drift: float, volatility: float) -> pd.DataFrame:
+    """Genera una serie OHLCV sintetica (random walk log-normale attorno a $2000)"""
+    rng = np.random.default_rng(seed)
+    
+    # Prezzi calcolati in place sul buffer dei ritorni
+    price = rng.normal(drift, volatility, periods)
+    np.cumsum(price, out=price)
+    np.exp(price, out=price)
+    price *= 2000
+    
+    return pd.DataFrame({
+        'open': price,
+        'high': price * 1.01,
+        'low': price * 0.99,
+        'close': price,
+        'volume': rng.integers(1000, 10000, periods)
+    }, index=pd.date_range('2023-01-01', periods=periods, freq='D'))
+
+
 # ============================================================================
 # ESEMPIO 1: Uso base della strategia
 # ============================================================================
@@ -18,20 +42,7 @@ def example_basic():
     print("-" * 60)
     
     # Genera dati di test
-    import numpy as np
-    
-    np.random.seed(123)
-    dates = pd.date_range('2023-01-01', periods=500, freq='D')
-    returns = np.random.normal(0.001, 0.02, 500)
-    prices = 2000 * np.exp(np.cumsum(returns))
-    
-    data = pd.DataFrame({
-        'open': prices,
-        'high': prices * 1.01,
-        'low': prices * 0.99,
-        'close': prices,
-        'volume': np.random.randint(1000, 10000, 500)
-    }, index=dates)
+    data = _sample_data(periods=500, seed=123, drift=0.001, volatility=0.02)
     
     # Crea strategia e esegui backtest
     strategy = TSMOM(period_short=5, period_long=20)
@@ -65,7 +76,7 @@ def example_manual_signals():
     signals = strategy.generate_signals(data)
     
     print("Segnali generati:")
-    print(signals[['close', 'signal_state', 'signal_score']].tail())
+    print(signals[['close', 'signal_value', 'signal_score']].tail())
     print()
 
 
@@ -79,20 +90,7 @@ def example_trade_analysis():
     print("-" * 60)
     
     # Crea dati e strategia
-    import numpy as np
-    
-    np.random.seed(42)
-    dates = pd.date_range('2023-01-01', periods=200, freq='D')
-    returns = np.random.normal(0.0005, 0.015, 200)
-    prices = 2000 * np.exp(np.cumsum(returns))
-    
-    data = pd.DataFrame({
-        'open': prices,
-        'high': prices * 1.01,
-        'low': prices * 0.99,
-        'close': prices,
-        'volume': np.random.randint(1000, 10000, 200)
-    }, index=dates)
+    data = _sample_data(periods=200, seed=42, drift=0.0005, volatility=0.015)
     
     # Backtest
     strategy = TSMOM(period_short=5, period_long=15)
@@ -124,27 +122,58 @@ def example_trade_analysis():
 # ESEMPIO 4: Confronto di parametri diversi
 # ============================================================================
 
-def example_parameter_comparison():
-    """Confronta la performance con parametri diversi"""
+def _run_one(config: tuple, data: pd.DataFrame) -> dict:
+    """Esegue il backtest di una configurazione (top-level: serializzabile per i worker)"""
+    short, long, name = config
+    strategy = TSMOM(period_short=short, period_long=long)
+    engine = BacktestEngine(strategy, initial_capital=50000)
+    result = engine.run(data)
+    stats = PerformanceAnalyzer.get_summary_stats(result)
+    
+    return {
+        'Config': name,
+        'Trades': stats['total_trades'],
+        'Win Rate': f"{stats['win_rate']:.1%}",
+        'Total P&L': f"${stats['total_pnl']:.0f}",
+        'Avg P&L': f"{stats['avg_pnl_pct']*100:.2f}%"
+    }
+
+
+def _run_one_shared(config: tuple, shm_name: str, periods: int) -> dict:
+    """
+    Come _run_one, ma legge prezzi e timestamp da un blocco di memoria condivisa
+    
+    Il blocco contiene `periods` chiusure float64 seguite da `periods`
+    timestamp int64 (ns): i worker non ricevono più una copia serializzata
+    del DataFrame, utile per sweep ampi su serie lunghe.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        close = np.frombuffer(shm.buf, dtype=np.float64, count=periods).copy()
+        times = np.frombuffer(shm.buf, dtype=np.int64, count=periods, offset=close.nbytes).copy()
+    finally:
+        shm.close()
+    
+    data = pd.DataFrame({'close': close}, index=pd.DatetimeIndex(times))
+    return _run_one(config, data)
+
+
+def example_parameter_comparison(use_shared_memory: bool = False):
+    """
+    Confronta la performance con parametri diversi
+    
+    Le configurazioni sono indipendenti e vengono eseguite in parallelo
+    su processi separati.
+    
+    Args:
+        use_shared_memory: Se True, i dati sono condivisi via SharedMemory
+                           invece di essere serializzati per ogni worker
+    """
     print("ESEMPIO 4: Confronto parametri")
     print("-" * 60)
     
     # Dati comuni
-    import numpy as np
-    import pandas as pd
-    
-    np.random.seed(99)
-    dates = pd.date_range('2023-01-01', periods=300, freq='D')
-    returns = np.random.normal(0.0003, 0.015, 300)
-    prices = 2000 * np.exp(np.cumsum(returns))
-    
-    data = pd.DataFrame({
-        'open': prices,
-        'high': prices * 1.01,
-        'low': prices * 0.99,
-        'close': prices,
-        'volume': np.random.randint(1000, 10000, 300)
-    }, index=dates)
+    data = _sample_data(periods=300, seed=99, drift=0.0003, volatility=0.015)
     
     # Test diversi parametri
     configs = [
@@ -153,20 +182,24 @@ def example_parameter_comparison():
         (10, 30, "Conservativo"),
     ]
     
-    results = []
-    for short, long, name in configs:
-        strategy = TSMOM(period_short=short, period_long=long)
-        engine = BacktestEngine(strategy, initial_capital=50000)
-        result = engine.run(data)
-        stats = PerformanceAnalyzer.get_summary_stats(result)
-        
-        results.append({
-            'Config': name,
-            'Trades': stats['total_trades'],
-            'Win Rate': f"{stats['win_rate']:.1%}",
-            'Total P&L': f"${stats['total_pnl']:.0f}",
-            'Avg P&L': f"{stats['avg_pnl_pct']*100:.2f}%"
-        })
+    if use_shared_memory:
+        periods = len(data)
+        shm = SharedMemory(create=True, size=2 * periods * 8)
+        try:
+            np.frombuffer(shm.buf, dtype=np.float64, count=periods)[:] = data['close'].to_numpy()
+            np.frombuffer(shm.buf, dtype=np.int64, count=periods, offset=periods * 8)[:] = (
+                data.index.values.astype('datetime64[ns]').view(np.int64)
+            )
+            with ProcessPoolExecutor(max_workers=len(configs)) as executor:
+                results = list(executor.map(
+                    partial(_run_one_shared, shm_name=shm.name, periods=periods), configs
+                ))
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        with ProcessPoolExecutor(max_workers=len(configs)) as executor:
+            results = list(executor.map(partial(_run_one, data=data), configs))
     
     # Stampa risultati in formato tabella
     comparison = pd.DataFrame(results)
@@ -184,20 +217,7 @@ def example_distribution():
     print("-" * 60)
     
     # Crea dati
-    import numpy as np
-    
-    np.random.seed(50)
-    dates = pd.date_range('2023-01-01', periods=250, freq='D')
-    returns = np.random.normal(0.0002, 0.012, 250)
-    prices = 2000 * np.exp(np.cumsum(returns))
-    
-    data = pd.DataFrame({
-        'open': prices,
-        'high': prices * 1.01,
-        'low': prices * 0.99,
-        'close': prices,
-        'volume': np.random.randint(1000, 10000, 250)
-    }, index=dates)
+    data = _sample_data(periods=250, seed=50, drift=0.0002, volatility=0.012)
     
     # Backtest
     strategy = TSMOM(period_short=5, period_long=20)
@@ -12,12 +12,72 @@ from datetime import datetime, timedelta
 from tsmom.strategy import TSMOM, SignalState
 from backtest.engine import BacktestEngine
 from analysis.stats import PerformanceAnalyzer, Plotter
+from tsmom.cache import disk_cache
+
+
+@disk_cache(ttl_hours=24)
+def download_gold_data(
+    symbol: str = "GC=F",
+    start_date: str = "2023-01-01",
+    end_date: str = None,
+    interval: str = "1d"
+) -> pd.DataFrame:
+    """
+    Scarica i dati storici da OpenBB (con cache su disco di 24 ore)
+    
+    Args:
+        symbol: Ticker del sottostante (default: GC=F, Gold Futures)
+        start_date: Data di inizio (formato YYYY-MM-DD)
+        end_date: Data di fine (formato YYYY-MM-DD), default = oggi
+        interval: Intervallo delle candele
+        
+    Returns:
+        DataFrame con OHLC data
+        
+    Raises:
+        Exception: Se il download non riesce (nulla viene memorizzato)
+    """
+    from openbb import obb
+    
+    print(f"   Scaricamento dati oro da OpenBB...")
+    print(f"   Periodo: {start_date} a {end_date if end_date else 'oggi'}")
+    
+    # Scarica i dati dell'oro (GOLD è il ticker per l'oro su OpenBB)
+    # OpenBB supporta solo '1m' (1 minuto) e '1d' (1 giorno)
+    # Scaricheremo dati giornalieri e li usiamo per il backtest
+    data = obb.equity.price.historical(
+        symbol=symbol,
+        start_date=start_date,
+        end_date=end_date,
+        interval=interval
+    )
+    
+    # Converti in DataFrame
+    df = data.to_pandas()
+    
+    # Rinomina le colonne per coerenza con il nostro formato
+    df = df.rename(columns={
+        'open': 'open',
+        'high': 'high',
+        'low': 'low',
+        'close': 'close',
+        'volume': 'volume'
+    })
+    
+    # Mantieni solo le colonne necessarie e indice datetime
+    df = df[['open', 'high', 'low', 'close', 'volume']].copy()
+    df.index.name = None
+    
+    return df
 
 
 def get_gold_data_from_openbb(start_date: str = "2023-01-01", end_date: str = None) -> pd.DataFrame:
     """
     Scarica dati dell'oro da OpenBB
     
+    I download riusciti sono memorizzati in .cache/ per 24 ore;
+    i dati di test usati in caso di errore non vengono mai memorizzati.
+    
     Args:
         start_date: Data di inizio (formato YYYY-MM-DD)
         end_date: Data di fine (formato YYYY-MM-DD), default = oggi
@@ -26,37 +86,13 @@ def get_gold_data_from_openbb(start_date: str = "2023-01-01", end_date: str = No
         DataFrame con OHLC data dell'oro
     """
     try:
-        from openbb import obb
-        
-        print(f"   Scaricamento dati oro da OpenBB...")
-        print(f"   Periodo: {start_date} a {end_date if end_date else 'oggi'}")
-        
-        # Scarica i dati dell'oro (GOLD è il ticker per l'oro su OpenBB)
-        # OpenBB supporta solo '1m' (1 minuto) e '1d' (1 giorno)
-        # Scaricheremo dati giornalieri e li usiamo per il backtest
-        data = obb.equity.price.historical(
+        df = download_gold_data(
             symbol="GC=F",  # Gold Futures
             start_date=start_date,
             end_date=end_date,
             interval="1d"  # Intervallo giornaliero
         )
         
-        # Converti in DataFrame
-        df = data.to_pandas()
-        
-        # Rinomina le colonne per coerenza con il nostro formato
-        df = df.rename(columns={
-            'open': 'open',
-            'high': 'high',
-            'low': 'low',
-            'close': 'close',
-            'volume': 'volume'
-        })
-        
-        # Mantieni solo le colonne necessarie e indice datetime
-        df = df[['open', 'high', 'low', 'close', 'volume']].copy()
-        df.index.name = None
-        
         print(f"   ✓ Dati scaricati: {len(df)} candele")
         print(f"   ✓ Intervallo: {df.index[0].date()} a {df.index[-1].date()}")
         
@@ -79,21 +115,34 @@ def generate_sample_data(periods: int = 500, seed: int = 42) -> pd.DataFrame:
     Returns:
         DataFrame con OHLC data
     """
-    np.random.seed(seed)
-    
-    # Genera prezzi con random walk (oro ~$2000)
-    returns = np.random.normal(0.0005, 0.01, periods)
-    price = 2000 * np.exp(np.cumsum(returns))
+    rng = np.random.default_rng(seed)
+    
+    # Genera prezzi con random walk (oro ~$2000), in place sul buffer dei ritorni
+    price = rng.normal(0.0005, 0.01, periods)
+    np.cumsum(price, out=price)
+    np.exp(price, out=price)
+    price *= 2000
+    
+    # Moltiplicatori OHLC calcolati in place, senza temporanei intermedi
+    open_ = rng.uniform(-0.005, 0.005, periods)
+    open_ += 1
+    open_ *= price
+    high = rng.uniform(0, 0.01, periods)
+    high += 1
+    high *= price
+    low = rng.uniform(-0.01, 0, periods)
+    low += 1
+    low *= price
     
     # Crea il dataframe con dati giornalieri
     dates = pd.date_range(start='2023-01-01', periods=periods, freq='D')
     
     df = pd.DataFrame({
-        'open': price * (1 + np.random.uniform(-0.005, 0.005, periods)),
-        'high': price * (1 + np.random.uniform(0, 0.01, periods)),
-        'low': price * (1 + np.random.uniform(-0.01, 0, periods)),
+        'open': open_,
+        'high': high,
+        'low': low,
         'close': price,
-        'volume': np.random.randint(1000, 10000, periods)
+        'volume': rng.integers(1000, 10000, periods)
     }, index=dates)
     
     return df
@@ -139,14 +188,14 @@ def main(use_openbb: bool = True):
     print("\n3. Calcolo segnali...")
     signals_df = strategy.generate_signals(data)
     print(f"   Ultimi segnali:")
-    print(signals_df[['close', 'momentum_short', 'momentum_long', 'signal_state']].tail(10))
+    print(signals_df[['close', 'momentum_short', 'momentum_long', 'signal_value']].tail(10))
     
     # 4. Esegui il backtest
     print("\n4. Esecuzione backtest...")
     engine = BacktestEngine(strategy, initial_capital=10000)
-    result = engine.run(data)
+    result = engine.run(data, signals_df=signals_df)
     print(f"   Operazioni totali: {result.total_trades}")
-    print(f"   Operazioni aperte: {len([t for t in result.trades if not t.is_closed()])}")
+    print(f"   Operazioni aperte: {result.open_trades}")
     
     # 5. Analizza i risultati
     print("\n5. Analisi risultati...")
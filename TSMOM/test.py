@@ -10,32 +10,73 @@ import sys
 # Aggiungi il percorso al path
 sys.path.insert(0, '.')
 
-from tsmom.strategy import TSMOM
+from tsmom.strategy import TSMOM, SIGNAL_DTYPE
+from tsmom._numba_strategy import _tsmom_kernel, _tsmom_kernel_numpy
 from backtest.engine import BacktestEngine
 from analysis.stats import PerformanceAnalyzer
 
 
 def generate_gold_data(periods: int = 1000) -> pd.DataFrame:
     """Genera dati realistici dell'oro per testing"""
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
-    # Trend rialzista leggero + volatilità
-    returns = np.random.normal(0.0003, 0.008, periods)
-    price = 2000 * np.exp(np.cumsum(returns))
+    # Un'unica estrazione uniforme per open/high/low/volume
+    u = rng.random((periods, 4))
+    
+    # Trend rialzista leggero + volatilità, prezzi in place sul buffer dei ritorni
+    price = rng.standard_normal(periods)
+    price *= 0.008
+    price += 1.0003
+    np.cumprod(price, out=price)
+    price *= 2000.0
+    
+    # Moltiplicatori open/high/low in un'unica matrice (periods, 3),
+    # poi un solo prodotto broadcast con il prezzo
+    ohl = u[:, :3] * [0.006, 0.008, -0.008]
+    ohl[:, 0] -= 0.003
+    ohl += 1
+    ohl *= price[:, None]
     
     dates = pd.date_range(start='2023-01-01', periods=periods, freq='D')
     
     df = pd.DataFrame({
-        'open': price * (1 + np.random.uniform(-0.003, 0.003, periods)),
-        'high': price * (1 + np.random.uniform(0, 0.008, periods)),
-        'low': price * (1 + np.random.uniform(-0.008, 0, periods)),
+        'open': ohl[:, 0],
+        'high': ohl[:, 1],
+        'low': ohl[:, 2],
         'close': price,
-        'volume': np.random.randint(10000, 50000, periods)
+        'volume': (10000 + 40000 * u[:, 3]).astype(np.int32)
     }, index=dates)
     
     return df
 
 
+def check_kernel_parity(data: pd.DataFrame) -> bool:
+    """
+    Confronta il kernel compilato con il percorso NumPy
+    
+    Su prezzi reali e su prezzi interi (molti score in parità con la
+    soglia) le quattro uscite devono coincidere bit a bit. Senza Numba i
+    due kernel sono la stessa funzione e il controllo è banale.
+    """
+    rng = np.random.default_rng(7)
+    integer_prices = 100 + np.cumsum(rng.integers(-1, 2, len(data)))
+    
+    for close in (data['close'], integer_prices):
+        close = np.ascontiguousarray(close, dtype=SIGNAL_DTYPE)
+        for period_short, period_long, threshold in ((5, 20, 0.0), (3, 10, 0.01), (20, 5, 0.0)):
+            outputs = []
+            for kernel in (_tsmom_kernel, _tsmom_kernel_numpy):
+                out = [np.empty(len(close), dtype=SIGNAL_DTYPE) for _ in range(3)]
+                out.append(np.empty(len(close), dtype=np.int8))
+                kernel(close, period_short, period_long, SIGNAL_DTYPE(threshold), *out)
+                outputs.append(out)
+            
+            if not all(np.array_equal(a, b, equal_nan=True) for a, b in zip(*outputs)):
+                return False
+    
+    return True
+
+
 def main():
     print("="*70)
     print("TSMOM - GOLD Strategy (Test Mode)")
@@ -62,6 +103,9 @@ def main():
     print("\n3. Calcolo segnali...")
     signals_df = strategy.generate_signals(data)
     print(f"   ✓ Segnali calcolati")
+    if not check_kernel_parity(data):
+        raise AssertionError("Kernel Numba e NumPy danno risultati diversi")
+    print(f"   ✓ Kernel Numba e NumPy identici")
     
     long_signals = (signals_df['signal_value'] == 1).sum()
     short_signals = (signals_df['signal_value'] == -1).sum()
@@ -72,7 +116,7 @@ def main():
     # Backtest
     print("\n4. Esecuzione backtest...")
     engine = BacktestEngine(strategy, initial_capital=100000)
-    result = engine.run(data)
+    result = engine.run(data, signals_df=signals_df)
     print(f"   ✓ Backtest completato")
     print(f"   ✓ Operazioni totali: {result.total_trades}")
     
@@ -81,36 +125,40 @@ def main():
     stats = PerformanceAnalyzer.get_summary_stats(result)
     dist = PerformanceAnalyzer.get_trade_distribution(result)
     
-    print("\n" + "="*70)
-    print("STATISTICHE PRINCIPALI")
-    print("="*70)
-    
-    print(f"\n📊 OPERAZIONI:")
-    print(f"   Totale:       {stats['total_trades']}")
-    print(f"   Long:         {dist['long_trades']:>4} | Win Rate: {dist['long_win_rate']:>6.1%}")
-    print(f"   Short:        {dist['short_trades']:>4} | Win Rate: {dist['short_win_rate']:>6.1%}")
-    print(f"   Win Rate Avg: {stats['win_rate']:.1%}")
-    
-    print(f"\n💰 PERFORMANCE:")
-    print(f"   Total P&L:    ${stats['total_pnl']:>10.2f}")
-    print(f"   Avg P&L:      ${stats['avg_pnl']:>10.2f} ({stats['avg_pnl_pct']:>6.2%})")
-    print(f"   Max Win:      ${stats['largest_win']:>10.2f}")
-    print(f"   Max Loss:     ${stats['largest_loss']:>10.2f}")
-    
-    print(f"\n⏱️  DURATA OPERAZIONI (giorni):")
-    print(f"   Media:        {stats['avg_bars_held']:>10.1f}d")
-    print(f"   Max:          {stats['max_bars_held']:>10.1f}d")
-    print(f"   Min:          {stats['min_bars_held']:>10.1f}d")
-    
-    print(f"\n📈 EQUITY:")
+    # Report finale raccolto in memoria e scritto con un'unica write
+    out = []
+    out.append("\n" + "="*70)
+    out.append("STATISTICHE PRINCIPALI")
+    out.append("="*70)
+    
+    out.append(f"\n📊 OPERAZIONI:")
+    out.append(f"   Totale:       {stats['total_trades']}")
+    out.append(f"   Long:         {dist['long_trades']:>4} | Win Rate: {dist['long_win_rate']:>6.1%}")
+    out.append(f"   Short:        {dist['short_trades']:>4} | Win Rate: {dist['short_win_rate']:>6.1%}")
+    out.append(f"   Win Rate Avg: {stats['win_rate']:.1%}")
+    
+    out.append(f"\n💰 PERFORMANCE:")
+    out.append(f"   Total P&L:    ${stats['total_pnl']:>10.2f}")
+    out.append(f"   Avg P&L:      ${stats['avg_pnl']:>10.2f} ({stats['avg_pnl_pct']:>6.2%})")
+    out.append(f"   Max Win:      ${stats['largest_win']:>10.2f}")
+    out.append(f"   Max Loss:     ${stats['largest_loss']:>10.2f}")
+    
+    out.append(f"\n⏱️  DURATA OPERAZIONI (giorni):")
+    out.append(f"   Media:        {stats['avg_bars_held']:>10.1f}d")
+    out.append(f"   Max:          {stats['max_bars_held']:>10.1f}d")
+    out.append(f"   Min:          {stats['min_bars_held']:>10.1f}d")
+    
+    out.append(f"\n📈 EQUITY:")
     initial = result.equity_curve.iloc[0]
     final = result.equity_curve.iloc[-1]
     return_pct = ((final - initial) / initial) * 100
-    print(f"   Iniziale:     ${initial:>10.2f}")
-    print(f"   Finale:       ${final:>10.2f}")
-    print(f"   Return:       {return_pct:>10.2f}%")
+    out.append(f"   Iniziale:     ${initial:>10.2f}")
+    out.append(f"   Finale:       ${final:>10.2f}")
+    out.append(f"   Return:       {return_pct:>10.2f}%")
+    
+    out.append("\n" + "="*70 + "\n")
     
-    print("\n" + "="*70 + "\n")
+    sys.stdout.write("\n".join(out) + "\n")
     
     return result, signals_df
 
@@ -0,0 +1,18 @@
+"""
+Compatibility
+Gestione delle dipendenze opzionali e delle differenze tra versioni
+"""
+
+import sys
+
+# dataclass(slots=True) è disponibile solo da Python 3.10: sulle versioni
+# precedenti le dataclass restano con __dict__
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Numba è opzionale: senza di esso si usano i percorsi NumPy equivalenti
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
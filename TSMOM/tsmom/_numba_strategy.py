@@ -0,0 +1,129 @@
+"""
+TSMOM Core
+Kernel compilati per il calcolo di momentum, score e segnali
+"""
+
+import numpy as np
+
+from tsmom._compat import NUMBA_AVAILABLE, njit
+
+
+def _pct_change(arr: np.ndarray, period: int) -> np.ndarray:
+    """
+    Ritorni percentuali su `period` barre (equivalente a pct_change)
+    
+    Un'unica divisione in place sull'array dei prezzi al posto di
+    shift + divisione + sottrazione con due temporanei. Un `period`
+    negativo confronta con le barre successive, come pct_change(periods=-k):
+    i NaN sono allora in coda invece che in testa.
+    """
+    n = len(arr)
+    lag = min(abs(period), n)
+    
+    out = np.empty(n, dtype=arr.dtype)
+    if period >= 0:
+        nan, valid, base = slice(0, lag), slice(lag, n), slice(0, n - lag)
+    else:
+        nan, valid, base = slice(n - lag, n), slice(0, n - lag), slice(lag, n)
+    
+    out[nan] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(arr[valid], arr[base], out=out[valid])
+    out[valid] -= 1.0
+    
+    return out
+
+
+# Costanti dello score in float32: nel kernel Numba un letterale Python è
+# float64 e promuoverebbe tutto il calcolo, mentre NumPy (NEP 50) resta in
+# float32. Con queste costanti i due percorsi danno gli stessi bit
+_ONE = np.float32(1.0)
+_W_SHORT = np.float32(0.4)
+_W_LONG = np.float32(0.6)
+
+
+# Barre per blocco nel percorso NumPy: gli array di un blocco (256 KB
+# ciascuno in float32) restano in cache L2. Blocchi più piccoli (es. 4096)
+# pagano più overhead per chiamata ufunc di quanto risparmino in cache
+_TILE = 65536
+
+
+def _tsmom_kernel_numpy(close, period_short, period_long, threshold, ms, ml, score, sv):
+    """
+    Calcola momentum, score e codici del segnale negli array di output
+    
+    ms, ml e score (stesso dtype float di close) e sv (int8) sono
+    preallocati dal chiamante e lunghi quanto close. Le barre sono
+    elaborate a blocchi di _TILE: tutte le uscite di un blocco sono
+    prodotte prima di passare al successivo, invece di scorrere gli
+    array interi una volta per ogni operazione.
+    """
+    n = len(close)
+    # Durante il warm-up almeno un momentum è NaN: lo score è NaN e il
+    # segnale FLAT per costruzione, senza bisogno di calcolarli
+    warm = max(period_short, period_long)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for lo in range(0, n, _TILE):
+            hi = min(lo + _TILE, n)
+            
+            for period, out in ((period_short, ms), (period_long, ml)):
+                # Prima barra del blocco con `period` barre di storia
+                start = min(max(lo, period), hi)
+                out[lo:start] = np.nan
+                np.divide(close[start:hi], close[start - period:hi - period], out=out[start:hi])
+                out[start:hi] -= _ONE
+            
+            start = min(max(lo, warm), hi)
+            score[lo:start] = np.nan
+            sv[lo:start] = 0
+            
+            # Score composito: media ponderata dei due momentum
+            tile_score = score[start:hi]
+            np.multiply(ms[start:hi], _W_SHORT, out=tile_score)
+            tile_score += _W_LONG * ml[start:hi]
+            
+            # Codici senza rami, come differenza delle due maschere; uno
+            # score NaN (prezzi mancanti) dà False in entrambi, quindi FLAT
+            np.subtract(
+                (tile_score > threshold).view(np.int8),
+                (tile_score < -threshold).view(np.int8),
+                out=sv[start:hi]
+            )
+
+
+if NUMBA_AVAILABLE:
+    # fastmath senza 'nnan'/'ninf': il warm-up e i prezzi mancanti sono NaN.
+    # Senza 'contract' né 'arcp': una FMA su 0.4*short + 0.6*long o una
+    # divisione sostituita dal reciproco cambierebbero l'arrotondamento e lo
+    # score non coinciderebbe più bit a bit con il percorso NumPy.
+    # error_model='numpy': una divisione per zero dà inf come in NumPy
+    @njit(cache=True, fastmath={'nsz'}, error_model='numpy')
+    def _tsmom_kernel(close, period_short, period_long, threshold, ms, ml, score, sv):
+        """
+        Versione compilata di _tsmom_kernel_numpy: un solo passaggio sulle barre
+        
+        Ogni barra produce subito le sue quattro uscite, quindi non serve
+        la suddivisione a blocchi del percorso NumPy.
+        """
+        n = close.shape[0]
+        warm = min(max(period_short, period_long), n)
+        
+        # Warm-up: score NaN e segnale FLAT noti a priori
+        for i in range(warm):
+            ms[i] = close[i] / close[i - period_short] - _ONE if i >= period_short else np.nan
+            ml[i] = close[i] / close[i - period_long] - _ONE if i >= period_long else np.nan
+            score[i] = np.nan
+            sv[i] = 0
+        
+        # Dopo il warm-up il corpo del ciclo è senza rami
+        for i in range(warm, n):
+            short = close[i] / close[i - period_short] - _ONE
+            long = close[i] / close[i - period_long] - _ONE
+            s = _W_SHORT * short + _W_LONG * long
+            
+            ms[i] = short
+            ml[i] = long
+            score[i] = s
+            sv[i] = (s > threshold) - (s < -threshold)
+else:
+    _tsmom_kernel = _tsmom_kernel_numpy
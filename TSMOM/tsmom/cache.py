@@ -0,0 +1,62 @@
+"""
+Disk Cache
+Memoizzazione su disco (Parquet) dei DataFrame scaricati
+"""
+
+import functools
+import inspect
+import re
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+def disk_cache(ttl_hours: float = 24, cache_dir: str = ".cache"):
+    """
+    Decoratore che memorizza su file Parquet il DataFrame restituito
+    
+    La chiave è il nome della funzione più il valore di tutti gli argomenti
+    (default inclusi): una chiamata con gli stessi argomenti entro `ttl_hours`
+    rilegge il file invece di rieseguire la funzione. Le eccezioni della
+    funzione non vengono memorizzate e si propagano al chiamante.
+    
+    Senza un motore Parquet (pyarrow o fastparquet) la cache è disattivata
+    e la funzione viene semplicemente eseguita.
+    
+    Args:
+        ttl_hours: Validità di un file in cache (in ore)
+        cache_dir: Directory dei file di cache
+    """
+    ttl_seconds = ttl_hours * 3600
+    
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = "_".join(str(value) for value in bound.arguments.values())
+            key = re.sub(r"[^\w.=-]+", "-", key)
+            cache_path = Path(cache_dir) / f"{func.__name__}_{key}.parquet"
+            
+            if cache_path.exists() and time.time() - cache_path.stat().st_mtime < ttl_seconds:
+                try:
+                    return pd.read_parquet(cache_path)
+                except (ImportError, OSError, ValueError):
+                    pass  # File illeggibile o motore assente: si ricalcola
+            
+            df = func(*args, **kwargs)
+            
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                df.to_parquet(cache_path)
+            except (ImportError, OSError, ValueError):
+                pass  # La cache è un'ottimizzazione: un errore non blocca il risultato
+            
+            return df
+        
+        return wrapper
+    
+    return decorator
@@ -4,9 +4,22 @@ Calcolo del segnale momentum su due orizzonti temporali
 """
 
 import pandas as pd
+import multiprocessing
 import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional
+
+from tsmom._compat import DATACLASS_SLOTS
+from tsmom._numba_strategy import _ONE, _W_LONG, _W_SHORT, _pct_change, _tsmom_kernel
+
+
+# Precisione di momentum e score: float32 dimezza la memoria letta e scritta
+# dal kernel. Prezzi, equity e P&L del backtest restano in float64
+SIGNAL_DTYPE = np.float32
 
 
 class SignalState(Enum):
@@ -16,9 +29,9 @@ class SignalState(Enum):
     FLAT = 0
 
 
-@dataclass
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class TSMOMSignal:
-    """Risultato del calcolo del segnale"""
+    """Risultato del calcolo del segnale (immutabile, senza __dict__ da Python 3.10)"""
     timestamp: pd.Timestamp
     state: SignalState
     momentum_short: float  # Momentum su orizzonte breve
@@ -26,6 +39,63 @@ class TSMOMSignal:
     score: float           # Score composito
 
 
+@dataclass(**DATACLASS_SLOTS)
+class SignalColumns:
+    """
+    Segnali in formato colonnare: array NumPy allineati all'indice
+    
+    Gli array dei segnali provengono dalla cache della strategia e sono
+    in sola lettura; `close` è in float64 come richiesto dal backtest.
+    """
+    index: pd.Index
+    close: np.ndarray           # Prezzi di chiusura (float64)
+    momentum_short: np.ndarray  # Momentum a breve termine
+    momentum_long: np.ndarray   # Momentum a lungo termine
+    score: np.ndarray           # Score composito
+    signal: np.ndarray          # Codici int8 (-1, 0, 1), cioè SignalState.value
+    
+    def __len__(self) -> int:
+        return len(self.signal)
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SignalColumns':
+        """Costruisce le colonne da un DataFrame di generate_signals"""
+        return cls(
+            index=df.index,
+            close=df['close'].to_numpy(np.float64),
+            momentum_short=df['momentum_short'].to_numpy(),
+            momentum_long=df['momentum_long'].to_numpy(),
+            score=df['signal_score'].to_numpy(),
+            signal=df['signal_value'].to_numpy(np.int8)
+        )
+    
+    def frame_columns(self) -> dict:
+        """Array dei segnali con i nomi di colonna di generate_signals"""
+        return {
+            'momentum_short': self.momentum_short,
+            'momentum_long': self.momentum_long,
+            'signal_score': self.score,
+            'signal_value': self.signal
+        }
+
+
+def _pool_context():
+    """Contesto multiprocessing senza fork: forkserver dove disponibile, altrimenti spawn"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _generate_signals_worker(
+    params: tuple,
+    data: pd.DataFrame,
+    join_ohlcv: bool = False
+) -> pd.DataFrame:
+    """Calcola i segnali di uno strumento (top-level: serializzabile per i worker)"""
+    period_short, period_long, threshold = params
+    strategy = TSMOM(period_short, period_long, threshold, cache_size=0)
+    return strategy.generate_signals(data, join_ohlcv=join_ohlcv)
+
+
 class TSMOM:
     """
     Time Series Momentum Strategy
@@ -38,7 +108,8 @@ class TSMOM:
         self,
         period_short: int = 5,
         period_long: int = 20,
-        threshold: float = 0.0
+        threshold: float = 0.0,
+        cache_size: int = 8
     ):
         """
         Inizializza la strategia TSMOM
@@ -47,10 +118,14 @@ class TSMOM:
             period_short: Periodo per il momentum a breve (in bar)
             period_long: Periodo per il momentum a lungo (in bar)
             threshold: Soglia minima per il cambio di stato
+            cache_size: Numero di serie di segnali memorizzate (0 = nessuna cache)
         """
         self.period_short = period_short
         self.period_long = period_long
         self.threshold = threshold
+        self.cache_size = cache_size
+        self._signal_cache = OrderedDict()
+        self.reset()
         
     def calculate_returns(self, prices: pd.Series, period: int) -> pd.Series:
         """
@@ -58,60 +133,168 @@ class TSMOM:
         
         Args:
             prices: Serie dei prezzi di chiusura
-            period: Numero di periodi per il calcolo dei ritorni
+            period: Numero di periodi per il calcolo dei ritorni (negativo:
+                ritorno verso le barre successive, come pct_change)
             
         Returns:
             Serie dei ritorni percentuali
         """
-        return prices.pct_change(periods=period)
+        out = _pct_change(prices.to_numpy(SIGNAL_DTYPE), period)
+        return pd.Series(out, index=prices.index, name=prices.name, copy=False)
     
-    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+    def generate_signals(self, data: pd.DataFrame, join_ohlcv: bool = False) -> pd.DataFrame:
         """
         Genera i segnali TSMOM per la serie storica
         
         Args:
             data: DataFrame con colonna 'close' (prezzi di chiusura)
                   Index deve essere datetime
+            join_ohlcv: Se True restituisce tutte le colonne di `data` più i
+                        segnali; altrimenti solo 'close' e i segnali
                   
         Returns:
-            DataFrame con colonne aggiuntive:
+            DataFrame con 'close' e le colonne:
             - momentum_short: Momentum a breve termine
             - momentum_long: Momentum a lungo termine
-            - signal_state: Stato del segnale (LONG/SHORT/FLAT)
-            - signal_value: Valore numerico del segnale (-1, 0, 1)
             - signal_score: Score composito del segnale
+            - signal_value: Codice int8 del segnale (-1, 0, 1), cioè SignalState.value
+        """
+        columns = self.generate_signals_soa(data).frame_columns()
+        
+        # Le colonne vengono copiate, così la cache non è esposta a modifiche
+        if join_ohlcv:
+            return data.assign(**{name: values.copy() for name, values in columns.items()})
+        
+        # Solo la colonna 'close' viene copiata, non l'intero OHLCV
+        return pd.DataFrame({'close': data['close'], **columns}, index=data.index, copy=True)
+    
+    def generate_signals_soa(self, data: pd.DataFrame) -> SignalColumns:
+        """
+        Genera i segnali TSMOM come array colonnari, senza DataFrame
+        
+        È il percorso usato dal backtest: nessuna colonna viene copiata
+        e gli array dei segnali sono condivisi (in sola lettura) con la cache.
+        
+        Args:
+            data: DataFrame con colonna 'close' (prezzi di chiusura)
+                  Index deve essere datetime
+                  
+        Returns:
+            SignalColumns allineate a data.index
         """
-        df = data.copy()
+        close = data['close']
+        
+        # I segnali dipendono solo dai prezzi di chiusura e dai parametri:
+        # chiamate ripetute sugli stessi dati riusano il calcolo memorizzato.
+        # Prezzi convertiti una sola volta in un buffer contiguo nel dtype
+        # del kernel: lo stesso array fa da chiave di cache e da input
+        columns = self._cached_signals(np.ascontiguousarray(close.to_numpy(SIGNAL_DTYPE)))
         
-        # Calcolo dei momentum
-        df['momentum_short'] = self.calculate_returns(
-            df['close'], 
-            self.period_short
+        return SignalColumns(
+            index=data.index,
+            close=close.to_numpy(np.float64),
+            momentum_short=columns['momentum_short'],
+            momentum_long=columns['momentum_long'],
+            score=columns['signal_score'],
+            signal=columns['signal_value']
         )
-        df['momentum_long'] = self.calculate_returns(
-            df['close'], 
-            self.period_long
+    
+    def generate_signals_multi(
+        self,
+        data: Dict[str, pd.DataFrame],
+        max_workers: Optional[int] = None,
+        join_ohlcv: bool = False
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Genera i segnali per più strumenti in parallelo su processi separati
+        
+        Ogni strumento è indipendente: i worker ricevono solo i parametri
+        della strategia e i propri dati, non la cache dell'istanza.
+        
+        Args:
+            data: Dizionario {simbolo: DataFrame con colonna 'close'}
+            max_workers: Numero di processi (None = numero di CPU);
+                         con 1 il calcolo avviene nel processo corrente
+            join_ohlcv: Come in generate_signals
+            
+        Returns:
+            Dizionario {simbolo: DataFrame dei segnali}, nello stesso ordine
+        """
+        if max_workers == 1 or len(data) <= 1:
+            return {
+                symbol: self.generate_signals(df, join_ohlcv=join_ohlcv)
+                for symbol, df in data.items()
+            }
+        
+        worker = partial(
+            _generate_signals_worker,
+            (self.period_short, self.period_long, self.threshold),
+            join_ohlcv=join_ohlcv
         )
+        # Niente fork: il processo chiamante può avere thread attivi (es. pool
+        # di Numba) e un fork con thread in corso può bloccarsi
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=_pool_context()) as executor:
+            results = executor.map(worker, data.values())
+            return dict(zip(data.keys(), results))
+    
+    def _cached_signals(self, close: np.ndarray) -> dict:
+        """
+        Recupera dalla cache LRU (o calcola) le colonne dei segnali
         
-        # Score composito: media ponderata dei due momentum
-        df['signal_score'] = (
-            0.4 * df['momentum_short'] + 
-            0.6 * df['momentum_long']
+        La chiave è il contenuto dei prezzi più i parametri della strategia,
+        quindi modificare i dati o i parametri invalida la voce.
+        """
+        key = (
+            close.dtype.str,
+            hash(close.tobytes()),
+            self.period_short,
+            self.period_long,
+            self.threshold
         )
         
-        # Generazione dei segnali
-        df['signal_value'] = 0
-        df.loc[df['signal_score'] > self.threshold, 'signal_value'] = 1
-        df.loc[df['signal_score'] < -self.threshold, 'signal_value'] = -1
+        columns = self._signal_cache.get(key)
+        if columns is not None:
+            self._signal_cache.move_to_end(key)
+            return columns
         
-        # Mapping ai stati
-        df['signal_state'] = df['signal_value'].map({
-            1: SignalState.LONG,
-            0: SignalState.FLAT,
-            -1: SignalState.SHORT
-        })
+        columns = self._compute_signals(close)
+        for values in columns.values():
+            values.flags.writeable = False
+        if self.cache_size > 0:
+            self._signal_cache[key] = columns
+            while len(self._signal_cache) > self.cache_size:
+                self._signal_cache.popitem(last=False)
         
-        return df
+        return columns
+    
+    def _compute_signals(self, close: np.ndarray) -> dict:
+        """
+        Calcola le colonne dei segnali come array
+        
+        `close` è un array contiguo di SIGNAL_DTYPE (vedi generate_signals).
+        
+        Momentum, score e codici sono prodotti da un unico kernel
+        sull'array dei prezzi, senza DataFrame né Series intermedi
+        """
+        n = len(close)
+        
+        momentum_short = np.empty(n, dtype=SIGNAL_DTYPE)
+        momentum_long = np.empty(n, dtype=SIGNAL_DTYPE)
+        score = np.empty(n, dtype=SIGNAL_DTYPE)
+        # Codici int8 del segnale: LONG = 1, FLAT = 0, SHORT = -1
+        signal_value = np.empty(n, dtype=np.int8)
+        
+        _tsmom_kernel(
+            close, self.period_short, self.period_long, SIGNAL_DTYPE(self.threshold),
+            momentum_short, momentum_long, score, signal_value
+        )
+        
+        return {
+            'momentum_short': momentum_short,
+            'momentum_long': momentum_long,
+            'signal_score': score,
+            'signal_value': signal_value
+        }
     
     def get_signal_at(
         self,
@@ -128,15 +311,103 @@ class TSMOM:
         Returns:
             Oggetto TSMOMSignal
         """
-        if timestamp not in data.index:
-            raise ValueError(f"Timestamp {timestamp} non trovato nei dati")
+        # Una sola ricerca nell'indice, poi accesso posizionale alle colonne
+        # senza estrarre la riga come Series
+        try:
+            i = data.index.get_loc(timestamp)
+        except (KeyError, TypeError):
+            raise ValueError(f"Timestamp {timestamp} non trovato nei dati") from None
         
-        row = data.loc[timestamp]
+        if not isinstance(i, (int, np.integer)):
+            raise ValueError(f"Timestamp {timestamp} duplicato nei dati")
         
+        # float() sui valori SIGNAL_DTYPE: il TSMOMSignal porta float Python
+        # (serializzabili in JSON), non scalari np.float32
         return TSMOMSignal(
             timestamp=timestamp,
-            state=row['signal_state'],
-            momentum_short=row['momentum_short'],
-            momentum_long=row['momentum_long'],
-            score=row['signal_score']
+            state=SignalState(int(data['signal_value'].to_numpy()[i])),
+            momentum_short=float(data['momentum_short'].to_numpy()[i]),
+            momentum_long=float(data['momentum_long'].to_numpy()[i]),
+            score=float(data['signal_score'].to_numpy()[i])
         )
+    
+    def get_signals_at(
+        self,
+        data: pd.DataFrame,
+        timestamps
+    ) -> List[TSMOMSignal]:
+        """
+        Recupera i segnali per più timestamp con una sola ricerca nell'indice
+        
+        Args:
+            data: DataFrame con i dati e i segnali già calcolati
+            timestamps: Timestamp da recuperare (anche un iteratore)
+            
+        Returns:
+            Lista di TSMOMSignal, nello stesso ordine di `timestamps`
+        """
+        if not data.index.is_unique:
+            raise ValueError("L'indice dei dati contiene timestamp duplicati")
+        
+        # Materializzati una volta: un generatore si esaurirebbe alla prima
+        # lettura e le successive vedrebbero una sequenza vuota
+        timestamps = pd.Index(timestamps)
+        positions = data.index.get_indexer(timestamps)
+        missing = positions < 0
+        if missing.any():
+            first = timestamps[int(np.argmax(missing))]
+            raise ValueError(f"Timestamp {first} non trovato nei dati")
+        
+        # Colonne estratte in blocco con indicizzazione vettoriale; tolist()
+        # converte in int e float Python come in get_signal_at
+        states = data['signal_value'].to_numpy()[positions].tolist()
+        momentum_short = data['momentum_short'].to_numpy()[positions].tolist()
+        momentum_long = data['momentum_long'].to_numpy()[positions].tolist()
+        score = data['signal_score'].to_numpy()[positions].tolist()
+        
+        return [
+            TSMOMSignal(
+                timestamp=timestamp,
+                state=SignalState(state),
+                momentum_short=ms,
+                momentum_long=ml,
+                score=sc
+            )
+            for timestamp, state, ms, ml, sc in zip(
+                timestamps, states, momentum_short, momentum_long, score
+            )
+        ]
+    
+    def reset(self):
+        """Svuota lo storico dei prezzi usato da update()"""
+        self._prices = deque(maxlen=max(self.period_short, self.period_long) + 1)
+    
+    def update(self, price: float) -> int:
+        """
+        Aggiorna il segnale con un nuovo prezzo di chiusura (modalità streaming)
+        
+        Mantiene solo le ultime max(period_short, period_long) + 1 chiusure,
+        quindi ogni barra costa O(1) invece di ricalcolare tutta la serie.
+        Il risultato coincide con signal_value di generate_signals sulla
+        stessa sequenza di prezzi (FLAT durante il warm-up): prezzi, score
+        e soglia sono in SIGNAL_DTYPE con le stesse costanti del kernel,
+        quindi anche gli score a ridosso della soglia danno lo stesso codice.
+        
+        Args:
+            price: Prezzo di chiusura della nuova barra
+            
+        Returns:
+            Codice del segnale (1, 0, -1), cioè SignalState.value
+        """
+        price = SIGNAL_DTYPE(price)
+        prices = self._prices
+        prices.append(price)
+        if len(prices) < prices.maxlen:
+            return SignalState.FLAT.value
+        
+        momentum_short = price / prices[-self.period_short - 1] - _ONE
+        momentum_long = price / prices[-self.period_long - 1] - _ONE
+        score = _W_SHORT * momentum_short + _W_LONG * momentum_long
+        threshold = SIGNAL_DTYPE(self.threshold)
+        
+        return int(score > threshold) - int(score < -threshold)